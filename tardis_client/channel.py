@@ -1,11 +1,44 @@
 from dataclasses import dataclass
-from typing import List
+from typing import Iterable, Tuple
 
 
 @dataclass(frozen=True)
 class Channel:
+    __slots__ = ("name", "symbols", "_hash")
+
     name: str
-    symbols: List[str]
+    symbols: Tuple[str, ...]
 
     def __post_init__(self):
-        self.symbols.sort()
+        # reject a bare string early - iterating it would silently turn 'XBTUSD'
+        # into single letter 'symbols' and request garbage from the API
+        if isinstance(self.symbols, str) or not isinstance(self.symbols, Iterable):
+            raise ValueError(
+                f"Invalid 'symbols' argument: {self.symbols}. Please provide list or tuple of symbol strings."
+            )
+
+        # normalize symbols to a deduplicated sorted tuple without mutating caller provided list
+        # this happens once at construction time and keeps cache paths stable for equal filters
+        # while duplicates would only inflate request urls and filter hashes
+        object.__setattr__(self, "symbols", tuple(sorted(set(self.symbols))))
+
+    def __getstate__(self):
+        # pickle/copy support for the slotted frozen dataclass - the default slot state
+        # restoration assigns via __setattr__ which frozen rejects, so restore explicitly
+        # the cached '_hash' is deliberately left out, it is recomputed on first use
+        return (self.name, self.symbols)
+
+    def __setstate__(self, state):
+        object.__setattr__(self, "name", state[0])
+        object.__setattr__(self, "symbols", state[1])
+
+    def __hash__(self):
+        # filters are hashed repeatedly when stored in sets or used as cache keys
+        # so compute the hash lazily on first use and cache it
+        try:
+            return self._hash
+        except AttributeError:
+            computed_hash = hash((self.name, self.symbols))
+            # '_hash' is a slot, not a field, so object.__setattr__ works despite frozen=True
+            object.__setattr__(self, "_hash", computed_hash)
+            return computed_hash
@@ -2,34 +2,135 @@ import os
 import logging
 import urllib
 import urllib.parse
-import pathlib
 import asyncio
 import aiohttp
-import aiofiles
-import secrets
+import itertools
 import random
 import json
 import tardis_client
 
+try:
+    # optional faster C implemented JSON serializer, stdlib json is used when not installed
+    import orjson
+except ImportError:
+    orjson = None
+
 from datetime import datetime, timedelta
 from time import time
-from tardis_client.handy import get_slice_cache_path
+from tardis_client.handy import get_feed_cache_dir, format_date_to_path
 
 
 logger = logging.getLogger(__name__)
 
+# process id plus incrementing counter is enough to keep temp cache file names unique
+# without reading from the OS CSPRNG for every cached slice
+_temp_file_counter = itertools.count()
+
+FETCH_DATA_CONCURRENCY_LIMIT = 60
+
+MAX_ATTEMPTS = 5
+# exponential backoff delays precomputed for every retry attempt number
+ATTEMPTS_DELAYS = tuple(2 ** attempt for attempt in range(MAX_ATTEMPTS + 1))
+
+# client sessions are cached per event loop and api key so subsequent replay calls
+# (common in backtests iterating over date ranges or exchanges) reuse the connector,
+# DNS cache and keep-alive connections instead of paying TLS handshakes again
+_client_sessions = {}
+
+
+def _close_stale_session(session):
+    # the session's loop is already closed so session.close() can't run anymore -
+    # the sync connector._close() handles the closed loop case (it marks the connector
+    # closed and releases pooled connections without touching the dead transports)
+    # and detach() marks the session closed, together silencing the 'unclosed client
+    # session/connector' errors their finalizers would log otherwise
+    try:
+        session.connector._close()
+    except AttributeError:
+        # _close is private aiohttp API - if an aiohttp release renames it the worst
+        # case should be the old unclosed connector log line, not a broken client
+        pass
+
+    session.detach()
+
+
+def _get_client_session(api_key, http_timeout):
+    # evict sessions created on event loops that have been closed since (eg one
+    # asyncio.run per backtest) so dead sessions don't pile up and pin their loops
+    for session_key in [session_key for session_key in _client_sessions if session_key[0].is_closed()]:
+        _close_stale_session(_client_sessions.pop(session_key))
+
+    session_key = (asyncio.get_running_loop(), api_key, http_timeout)
+    session = _client_sessions.get(session_key)
+
+    if session is None or session.closed:
+        headers = {
+            "Authorization": f"Bearer {api_key}" if api_key else "",
+            "User-Agent": f"tardis-client/{tardis_client.__version__} (+https://github.com/tardis-dev/tardis-python)",
+        }
+        # size the connection pool to the concurrency limit and cache DNS lookups
+        # so concurrent slice downloads reuse keep-alive connections instead of paying
+        # DNS resolution and TLS handshake costs per request
+        connector = aiohttp.TCPConnector(
+            limit=FETCH_DATA_CONCURRENCY_LIMIT,
+            limit_per_host=FETCH_DATA_CONCURRENCY_LIMIT,
+            ttl_dns_cache=300,
+            keepalive_timeout=75,
+            enable_cleanup_closed=True,
+        )
+        session = aiohttp.ClientSession(
+            connector=connector,
+            auto_decompress=False,
+            timeout=aiohttp.ClientTimeout(total=http_timeout),
+            headers=headers,
+            trust_env=True,
+            # larger read buffer means fewer event loop wakeups per downloaded slice
+            read_bufsize=2 ** 18,
+        )
+        _client_sessions[session_key] = session
+
+    return session
+
 
-async def fetch_data_to_replay(exchange, from_date, to_date, filters, endpoint, cache_dir, api_key, http_timeout, http_proxy):
-    timeout = aiohttp.ClientTimeout(total=http_timeout)
-    headers = {
-        "Authorization": f"Bearer {api_key}" if api_key else "",
-        "User-Agent": f"tardis-client/{tardis_client.__version__} (+https://github.com/tardis-dev/tardis-python)",
-    }
+async def close_sessions():
+    # closes cached client sessions belonging to the running event loop and drops
+    # entries of already closed loops - call it before shutting the loop down to
+    # release keep-alive connections and avoid unclosed session warnings at exit
+    current_loop = asyncio.get_running_loop()
 
+    for session_key in list(_client_sessions):
+        session_loop = session_key[0]
+
+        if session_loop is current_loop:
+            await _client_sessions.pop(session_key).close()
+        elif session_loop.is_closed():
+            _close_stale_session(_client_sessions.pop(session_key))
+
+
+async def fetch_data_to_replay(
+    exchange, from_date, to_date, filters, endpoint, cache_dir, api_key, http_timeout, http_proxy, slice_ready_events=None
+):
     minutes_diff = int(round((to_date - from_date).total_seconds() / 60))
-    offset = 0
-    FETCH_DATA_CONCURRENCY_LIMIT = 60
-    fetch_data_tasks = set()
+
+    # everything in the fetch url except the offset is the same for every slice of this
+    # replay, so serialize, url encode and concatenate the static prefix once here
+    filters_url_query = _serialize_filters_to_url_query(filters)
+    fetch_url_prefix = f"{endpoint}/v1/data-feeds/{exchange}?from={from_date.isoformat()}&offset="
+
+    # slice dates and cache paths are pure functions of the offset - compute them
+    # all up front instead of re-deriving (and re-hashing filters) inside every fetch task
+    feed_cache_dir = get_feed_cache_dir(cache_dir, exchange, filters)
+    slice_dates = [from_date + timedelta(minutes=offset) for offset in range(minutes_diff)]
+    cache_paths = [os.path.join(feed_cache_dir, format_date_to_path(slice_date)) + ".json.gz" for slice_date in slice_dates]
+
+    # single walk of the feed cache directory instead of one stat syscall per minute slice
+    # (for a warm month-long cache that's ~44k avoided stat calls)
+    cached_slice_paths = _list_cached_slice_paths(feed_cache_dir)
+
+    # ensure directories for slices that need fetching exist up front - slice paths share
+    # an hour directory, so this is O(hours) mkdir calls instead of one per fetched slice
+    for slice_cache_dir in {os.path.dirname(cache_path) for cache_path in cache_paths if cache_path not in cached_slice_paths}:
+        os.makedirs(slice_cache_dir, exist_ok=True)
 
     start_time = time()
 
@@ -41,27 +142,47 @@ async def fetch_data_to_replay(exchange, from_date, to_date, filters, endpoint,
         filters,
     )
 
-    async with aiohttp.ClientSession(auto_decompress=False, timeout=timeout, headers=headers, trust_env=True) as session:
-        # loop below will fetch data slices if not cached already concurrently up to the conecurrency limit
-        while offset < minutes_diff:
-            if len(fetch_data_tasks) >= FETCH_DATA_CONCURRENCY_LIMIT:
-                # if there are going to be more pending fetch data downloads than concurrency limit
-                # wait before adding another one
-                done, fetch_data_tasks = await asyncio.wait(fetch_data_tasks, return_when=asyncio.FIRST_COMPLETED)
-                # need to check the result that may throw if task finished with an error
-                done.pop().result()
-
-            fetch_data_tasks.add(
-                asyncio.create_task(
-                    _fetch_data_if_not_cached(session, endpoint, cache_dir, exchange, from_date, offset, filters, http_proxy)
-                )
+    # semaphore acquired inside each fetch task limits how many data slice downloads run concurrently
+    fetch_data_semaphore = asyncio.Semaphore(FETCH_DATA_CONCURRENCY_LIMIT)
+
+    session = _get_client_session(api_key, http_timeout)
+
+    # schedule fetch tasks only for slices that are not cached already - on re-runs over
+    # warm caches this skips creating (tens of) thousands of tasks and coroutine frames
+    # outright, replay detects the cached files directly on disk
+    fetch_data_tasks = [
+        asyncio.create_task(
+            _fetch_data_slice(
+                session,
+                fetch_data_semaphore,
+                fetch_url_prefix,
+                offset,
+                slice_dates[offset],
+                cache_paths[offset],
+                filters_url_query,
+                http_proxy,
+                slice_ready_events,
             )
-            offset += 1
+        )
+        for offset in range(minutes_diff)
+        if cache_paths[offset] not in cached_slice_paths
+    ]
 
-        # finally wait for the remaining fetch data download tasks
+    logger.debug("%i of %i data slices already in local cache", minutes_diff - len(fetch_data_tasks), minutes_diff)
+
+    # wait for all fetch data download tasks, this raises if any of them failed
+    try:
         await asyncio.gather(*fetch_data_tasks)
+    except BaseException:
+        # first error cancels the remaining downloads so they don't keep running
+        # in the background while the caller handles the failure
+        for fetch_data_task in fetch_data_tasks:
+            fetch_data_task.cancel()
+
+        await asyncio.gather(*fetch_data_tasks, return_exceptions=True)
+        raise
 
-        end_time = time()
+    end_time = time()
 
     logger.debug(
         "fetch data finished for '%s' exchange - from: %s, to: %s, filters: %s, total time: %s seconds",
@@ -73,29 +194,60 @@ async def fetch_data_to_replay(exchange, from_date, to_date, filters, endpoint,
     )
 
 
-async def _fetch_data_if_not_cached(session, endpoint, cache_dir, exchange, from_date, offset, filters, http_proxy):
-    slice_date = from_date + timedelta(seconds=offset * 60)
-    cache_path = get_slice_cache_path(cache_dir, exchange, slice_date, filters)
+def _serialize_filters_to_url_query(filters):
+    if filters is None or len(filters) == 0:
+        return ""
+
+    # convert fitlers to dictionary so can be json serialized (use names required by the API: channel, symbols)
+    # symbols tuples become lists as orjson does not serialize tuples
+    filters_serializable = [{"channel": filter.name, "symbols": list(filter.symbols)} for filter in filters]
 
-    # fetch and cache slice only if it's not cached already
-    if os.path.isfile(cache_path) == False:
-        await _reliably_fetch_and_cache_slice(session, endpoint, exchange, from_date, offset, filters, cache_path, http_proxy)
-        logger.debug("fetched data slice for date %s from the API and cached - %s", slice_date, cache_path)
+    if orjson is not None:
+        # orjson returns bytes, so url encode with quote_from_bytes and skip the str round trip
+        # (urllib.parse.quote would just re-encode the str back to utf-8 internally)
+        filters_url_encoded = urllib.parse.quote_from_bytes(orjson.dumps(filters_serializable), safe="~()*!.'")
     else:
-        logger.debug("data slice for date %s already in local cache - %s", slice_date, cache_path)
+        filters_serialized = json.dumps(filters_serializable, separators=(",", ":"))
+        filters_url_encoded = urllib.parse.quote(filters_serialized, safe="~()*!.'")
 
+    return f"&filters={filters_url_encoded}"
 
-async def _reliably_fetch_and_cache_slice(session, endpoint, exchange, from_date, offset, filters, cache_path, http_proxy):
-    fetch_url = f"{endpoint}/v1/data-feeds/{exchange}?from={from_date.isoformat()}&offset={offset}"
 
-    if filters is not None and len(filters) > 0:
-        # convert fitlers to dictionary so can be json serialized (use names required by the API: channel, symbols)
-        filters_serializable = [{"channel": filter.name, "symbols": filter.symbols} for filter in filters]
-        filters_serialized = json.dumps(filters_serializable, separators=(",", ":"))
-        filters_url_encoded = urllib.parse.quote(filters_serialized, safe="~()*!.'")
-        fetch_url += f"&filters={filters_url_encoded}"
+def _list_cached_slice_paths(feed_cache_dir):
+    cached_slice_paths = set()
+
+    for dir_path, _, file_names in os.walk(feed_cache_dir):
+        for file_name in file_names:
+            cached_slice_paths.add(os.path.join(dir_path, file_name))
+
+    return cached_slice_paths
+
+
+async def _fetch_data_slice(
+    session,
+    fetch_data_semaphore,
+    fetch_url_prefix,
+    offset,
+    slice_date,
+    cache_path,
+    filters_url_query,
+    http_proxy,
+    slice_ready_events,
+):
+    # slices that are cached already were filtered out at scheduling time
+    async with fetch_data_semaphore:
+        await _reliably_fetch_and_cache_slice(session, fetch_url_prefix, offset, filters_url_query, cache_path, http_proxy)
+
+    logger.debug("fetched data slice for date %s from the API and cached - %s", slice_date, cache_path)
+
+    # signal that slice for given offset is available on disk so awaiting replay can resume immediately
+    if slice_ready_events is not None:
+        slice_ready_events.setdefault(offset, asyncio.Event()).set()
+
+
+async def _reliably_fetch_and_cache_slice(session, fetch_url_prefix, offset, filters_url_query, cache_path, http_proxy):
+    fetch_url = f"{fetch_url_prefix}{offset}{filters_url_query}"
 
-    MAX_ATTEMPTS = 5
     attempts = 0
 
     while True:
@@ -105,52 +257,70 @@ async def _reliably_fetch_and_cache_slice(session, endpoint, exchange, from_date
             await _fetch_and_cache_slice(session, url=fetch_url, cache_path=cache_path, http_proxy=http_proxy)
             break
 
-        except asyncio.CancelledError:
-            break
+        # only network/API level errors are worth retrying - anything else
+        # (CancelledError, RuntimeError etc) propagates naturally
+        except urllib.error.HTTPError as ex:
+            # do not retry when we've got bad, unauthorized, forbidden or not found request or enough attempts
+            # - those responses are deterministic so retrying only burns backoff delays
+            if (
+                attempts == MAX_ATTEMPTS
+                or (ex.code == 400 and "ISO 8601 format" not in ex.msg)
+                or ex.code in (401, 403, 404)
+            ):
+                raise ex
+
+            too_many_requests = ex.code == 429
+            fetch_error = ex
 
-        except Exception as ex:
-            if attempts == MAX_ATTEMPTS or isinstance(ex, RuntimeError):
+        except (aiohttp.ClientError, asyncio.TimeoutError, OSError) as ex:
+            if attempts == MAX_ATTEMPTS:
                 raise ex
 
-            if isinstance(ex, urllib.error.HTTPError):
-                # do not retry when we've got bad or unauthorized request or enough attempts
-                if (ex.code == 400 and 'ISO 8601 format' not in ex.msg) or ex.code == 401:
-                    raise ex
-                if ex.code == 429:
-                    too_many_requests = True
-
-            random_ingridient = random.random()
-            attempts_delay = 2 ** attempts
-            next_attempts_delay = random_ingridient + attempts_delay
-
-            if too_many_requests:
-                # when too many requests error received wait longer than normal
-                next_attempts_delay = 61
-            logger.debug(
-                "_fetch_and_cache_slice error: %s, next attempt delay: %is, path: %s", ex, next_attempts_delay, cache_path
-            )
+            fetch_error = ex
+
+        random_ingridient = random.random()
+        next_attempts_delay = random_ingridient + ATTEMPTS_DELAYS[attempts]
+
+        if too_many_requests:
+            # when too many requests error received wait longer than normal
+            next_attempts_delay = 61
+        logger.debug(
+            "_fetch_and_cache_slice error: %s, next attempt delay: %is, path: %s", fetch_error, next_attempts_delay, cache_path
+        )
 
-            await asyncio.sleep(next_attempts_delay)
+        await asyncio.sleep(next_attempts_delay)
 
 
 async def _fetch_and_cache_slice(session, url, cache_path, http_proxy):
     async with session.get(url,proxy=http_proxy) as response:
         if response.status != 200:
-            error_text = await response.text()
+            # read only a bounded head of the error body - gateway errors can return large
+            # HTML pages and we only need the message for the raised error
+            error_text = (await response.content.read(2048)).decode("utf-8", "replace")
             raise urllib.error.HTTPError(url, code=response.status, msg=error_text, hdrs=None, fp=None)
 
-        # ensure that directory where we want to cache data slice exists
-        pathlib.Path(cache_path).parent.mkdir(parents=True, exist_ok=True)
-        temp_cache_path = f"{cache_path}{secrets.token_hex(8)}.unconfirmed"
-        # write response stream to unconfirmed temp file
-        async with aiofiles.open(temp_cache_path, "wb") as temp_file:
-            async for data in response.content.iter_any():
-                await temp_file.write(data)
-
-        # rename temp file to desired name only if file has been fully and successfully saved
-        # it there is an error during renaming file it means that target file aready exists
-        # and we're fine as only successfully save files exist
-        try:
-            os.rename(temp_cache_path, cache_path)
-        except Exception as ex:
-            logger.debug("_fetch_and_cache_slice rename error: %s", ex)
\ No newline at end of file
+        # slices are small (gzipped single minute of data) so read the whole body at once
+        # and write it with a single call - one thread pool round-trip instead of one per network chunk
+        body = await response.read()
+
+        # directory where we cache data slices was already created by fetch_data_to_replay
+        temp_cache_path = f"{cache_path}{os.getpid()}.{next(_temp_file_counter)}.unconfirmed"
+        # write and rename in a single worker thread hop
+        await asyncio.get_event_loop().run_in_executor(None, _cache_slice_body, temp_cache_path, cache_path, body)
+
+
+def _cache_slice_body(temp_cache_path, cache_path, body):
+    # runs in a worker thread - one sync open/write/rename is cheaper than dispatching
+    # each of those separately through a thread backed async file wrapper
+
+    # write response body to unconfirmed temp file
+    with open(temp_cache_path, "wb") as temp_file:
+        temp_file.write(body)
+
+    # rename temp file to desired name only if file has been fully and successfully saved
+    # it there is an error during renaming file it means that target file aready exists
+    # and we're fine as only successfully save files exist
+    try:
+        os.rename(temp_cache_path, cache_path)
+    except Exception as ex:
+        logger.debug("_cache_slice_body rename error: %s", ex)
\ No newline at end of file
@@ -2,19 +2,36 @@ import os
 import json
 import hashlib
 from dataclasses import asdict
-from functools import reduce
+from functools import lru_cache, reduce
+
+
+def get_feed_cache_dir(cache_dir, exchange, filters):
+    # base directory shared by all slices of given exchange and filters combination
+    # callers that build many slice paths should compute it once as hashing filters is not free
+    return os.path.join(cache_dir, "feeds", exchange, get_filters_hash(filters))
 
 
 def get_slice_cache_path(cache_dir, exchange, date, filters):
-    return os.path.join(cache_dir, "feeds", exchange, get_filters_hash(filters), format_date_to_path(date)) + ".json.gz"
+    return os.path.join(get_feed_cache_dir(cache_dir, exchange, filters), format_date_to_path(date)) + ".json.gz"
+
+
+# hash of no filters provided is constant, compute it once
+_EMPTY_FILTERS_HASH = hashlib.sha256(json.dumps([]).encode("utf-8")).hexdigest()
 
 
 def get_filters_hash(filters):
     # it not filters were provided or were empty return empty list hash
     if filters is None or len(filters) == 0:
-        return hashlib.sha256(json.dumps([]).encode("utf-8")).hexdigest()
+        return _EMPTY_FILTERS_HASH
+
+    # filters rarely change within a session so memoize by (hashable) filters tuple
+    return _get_filters_hash_cached(tuple(filters))
 
+
+@lru_cache(maxsize=256)
+def _get_filters_hash_cached(filters):
     # convert fitlers to dictionary so can be json serialized (use the same names as other clients - channel, symbols)
+    # stdlib json is used on purpose - the digest must stay byte identical with other tardis clients
     filters_serializable = [{"channel": filter.name, "symbols": filter.symbols} for filter in filters]
     filters_serialized = json.dumps(filters_serializable, separators=(",", ":"))
     # return sha 256 hash digest of serialized filters
@@ -22,14 +39,4 @@ def get_filters_hash(filters):
 
 
 def format_date_to_path(date):
-    year = str(date.year)
-    month = double_digit(date.month)
-    day = double_digit(date.day)
-    hour = double_digit(date.hour)
-    minute = double_digit(date.minute)
-
-    return os.path.join(year, month, day, hour, minute)
-
-
-def double_digit(input):
-    return f"0{input}" if input < 10 else f"{input}"
+    return os.path.join(f"{date.year}", f"{date.month:02d}", f"{date.day:02d}", f"{date.hour:02d}", f"{date.minute:02d}")
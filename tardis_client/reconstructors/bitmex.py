@@ -35,7 +35,7 @@ class BitmexMarketReconstructor(MarketReconstructor):
         is_order_book_delta = table == "orderBookL2"
         is_partial = action == "partial"
 
-        if is_trade == False and is_order_book_delta == False:
+        if not is_trade and not is_order_book_delta:
             return
         # ignore trade partials, we could end up with duplicated trades otherwise
         if is_trade and is_partial:
@@ -44,22 +44,34 @@ class BitmexMarketReconstructor(MarketReconstructor):
         message_type = MESSAGE_TYPE.TRADES if is_trade else MESSAGE_TYPE.BOOK_DELTA
         items = []
 
+        # bind attributes used in the loop below to locals (LOAD_FAST instead of repeated
+        # attribute lookups) and hoist the per-message constants - the loop runs once per
+        # data item, millions of times for a busy order book replay
+        symbols_set = self._symbols_set
+        id_to_price_map = self._id_to_price_map
+        map_trade = self._map_trade
+        map_order_book_update = self._map_order_book_update
+        apply_book_update_to_order_book = self._apply_book_update_to_order_book
+        items_append = items.append
+        is_insert_or_partial = action == "partial" or action == "insert"
+        update_type = None if is_trade else self._action_to_update_type_map[action]
+
         for item in message["data"]:
             symbol = item["symbol"]
             # ignore data items for symbols we're not requested for
             # that could happen for example for partial messages that contained multiple symbols in single message
-            if symbol not in self._symbols:
+            if symbol not in symbols_set:
                 continue
 
             if is_trade:
-                items.append(self._map_trade(item))
+                items_append(map_trade(item))
             else:
 
-                if action == "partial" or action == "insert":
+                if is_insert_or_partial:
                     # bitmex update messages do not contain price only id, so we need to keep state about mapping from id to price level locally
-                    self._id_to_price_map[item["id"]] = item["price"]
+                    id_to_price_map[item["id"]] = item["price"]
 
-                price_level = item["price"] if "price" in item else self._id_to_price_map[item["id"]]
+                price_level = item["price"] if "price" in item else id_to_price_map[item["id"]]
                 # ignore book update when we don't know price level for it, in theory it could happen
                 #  when there was WS reconnection and after reconnection there was an immediate book update before partial message with book snapshot
                 # and that update didn't have matching price level, as we could miss insert message durring reconnection
@@ -68,10 +80,10 @@ class BitmexMarketReconstructor(MarketReconstructor):
                 if price_level is None:
                     continue
 
-                book_update = self._map_order_book_update(item, price_level, self._action_to_update_type_map[action])
-                items.append(book_update)
+                book_update = map_order_book_update(item, price_level, update_type)
+                items_append(book_update)
 
-                self._apply_book_update_to_order_book(book_update)
+                apply_book_update_to_order_book(book_update)
 
         # return order book state for symbol that is in first normalized item - BitMEX messages are uniform (same symbol for all items in the message)
         symbol = items[0].symbol
@@ -46,6 +46,8 @@ class MarketReconstructor:
         self._books = {}
         self._books_views = {}
         self._symbols = symbols
+        # frozenset for the per-item symbol membership checks in reconstruct hot loops
+        self._symbols_set = frozenset(symbols)
 
         for symbol in symbols:
             self._books[symbol] = {ASK: SortedDict(), BID: SortedDict()}
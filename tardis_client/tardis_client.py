@@ -1,19 +1,32 @@
 import asyncio
-import gzip
 import logging
-import json as default_json
 import os
 import tempfile
 import shutil
 
+try:
+    # optional faster C implemented JSON parser - used as the default for decoding
+    # replayed messages when installed, callers can still pass any module exposing
+    # loads() via the replay 'json' argument
+    import orjson as default_json
+except ImportError:
+    import json as default_json
+
+try:
+    # optional SIMD accelerated gzip implementation (Intel ISA-L) with the same API,
+    # typically 2-4x faster at decompressing cached slices than stdlib zlib
+    from isal import igzip as gzip
+except ImportError:
+    import gzip
+
 from time import time
 from typing import List, AsyncIterable
 from collections import namedtuple
 from datetime import datetime, timedelta
 
-from tardis_client.handy import get_slice_cache_path
+from tardis_client.handy import get_feed_cache_dir, format_date_to_path
 from tardis_client.channel import Channel
-from tardis_client.data_downloader import fetch_data_to_replay
+from tardis_client.data_downloader import fetch_data_to_replay, close_sessions
 from tardis_client.reconstructors import get_market_reconstructor
 from tardis_client.reconstructors.market_reconstructor import MarketResponse
 
@@ -23,6 +36,41 @@ DATE_MESSAGE_SPLIT_INDEX = 28
 DEFAULT_CACHE_DIR = os.path.join(tempfile.gettempdir(), ".tardis-cache")
 
 
+def _parse_line_timestamp(line):
+    # local timestamps provided by the API always have fixed width ISO 8601 format
+    # eg 2019-08-01T08:52:00.0324272Z - parse the known byte offsets directly with int()
+    # (which accepts bytes, so no utf-8 decode is needed) instead of going through
+    # datetime.fromisoformat - this runs once per replayed message
+    # python datetime has microsecond precision so the last digit of the 100ns precision
+    # fraction is ignored, same as the previous fromisoformat based parsing
+    return datetime(
+        int(line[0:4]),
+        int(line[5:7]),
+        int(line[8:10]),
+        int(line[11:13]),
+        int(line[14:16]),
+        int(line[17:19]),
+        int(line[20:26]),
+    )
+
+
+def _read_slice_lines(slice_path):
+    # runs in a worker thread - decompresses single minute data slice and splits it into lines
+    # slices are small so read the compressed file and decompress it with one call each,
+    # skipping GzipFile's internal small-buffer read loop
+    with open(slice_path, "rb") as file:
+        data = gzip.decompress(file.read())
+
+    lines = data.split(b"\n")
+
+    # data ends with a newline so the split leaves an empty trailing element - drop it,
+    # any remaining empty lines are real disconnect markers
+    if len(lines) > 0 and len(lines[-1]) == 0:
+        lines.pop()
+
+    return lines
+
+
 class TardisClient:
     def __init__(self, endpoint="https://api.tardis.dev", cache_dir=DEFAULT_CACHE_DIR, api_key="", http_timeout=60, http_proxy=None):
         self.logger = logging.getLogger(__name__)
@@ -66,9 +114,29 @@ class TardisClient:
             filters,
         )
 
+        # filters hash embedded in the cache path is constant for the whole replay
+        # so compute the base directory once instead of re-hashing filters per polled slice
+        feed_cache_dir = get_feed_cache_dir(self.cache_dir, exchange, filters)
+
+        # per offset events signalled by the fetch task as soon as each slice is confirmed
+        # to be on disk - this way we resume right away instead of polling the filesystem
+        slice_ready_events = {}
+        current_slice_offset = 0
+
         # start fetch_data_to_replay task
         fetch_data_task = asyncio.create_task(
-            fetch_data_to_replay(exchange, from_date, to_date, filters, self.endpoint, self.cache_dir, self.api_key, self.http_timeout, self.http_proxy)
+            fetch_data_to_replay(
+                exchange,
+                from_date,
+                to_date,
+                filters,
+                self.endpoint,
+                self.cache_dir,
+                self.api_key,
+                self.http_timeout,
+                self.http_proxy,
+                slice_ready_events,
+            )
         )
 
         # iterate over every minute in <=from_date,to_date> date range
@@ -77,9 +145,10 @@ class TardisClient:
         while current_slice_date < to_date:
             current_slice_path = None
             while current_slice_path is None:
-                # this allows other tasks to run (suspends current task)
-                await asyncio.sleep(0)
-                path_to_check = get_slice_cache_path(self.cache_dir, exchange, current_slice_date, filters)
+                # no explicit yield to the event loop is needed here - when the slice is already
+                # cached the run_in_executor hop below suspends this task once per slice, and
+                # when it's not we await its readiness event anyway
+                path_to_check = os.path.join(feed_cache_dir, format_date_to_path(current_slice_date)) + ".json.gz"
 
                 self.logger.debug("getting slice: %s", path_to_check)
 
@@ -92,44 +161,60 @@ class TardisClient:
                 # if data for requested date already exists we can proceed further
                 if os.path.isfile(path_to_check):
                     current_slice_path = path_to_check
-                # otherwise if data for requested date is not ready yet (cached) wait 100ms and check again
+                elif fetch_data_task.done():
+                    # fetch task finished cleanly but the slice is not on disk (yet) - fall
+                    # back to polling as there is no event that could wake us up anymore
+                    await asyncio.sleep(0.1)
+                # otherwise wait until the fetch task signals that slice has been cached
                 else:
                     self.logger.debug("waiting for slice: %s", path_to_check)
-                    await asyncio.sleep(0.1)
+                    slice_ready_event = slice_ready_events.setdefault(current_slice_offset, asyncio.Event())
+                    wait_for_slice_task = asyncio.create_task(slice_ready_event.wait())
+                    # wait on the fetch task as well so its premature failure wakes us immediately
+                    await asyncio.wait({wait_for_slice_task, fetch_data_task}, return_when=asyncio.FIRST_COMPLETED)
+                    wait_for_slice_task.cancel()
+
+            slice_ready_events.pop(current_slice_offset, None)
 
             messages_count = 0
 
-            # open data file as binary and read line by line
-            with gzip.open(current_slice_path, "rb") as file:
-                for line in file:
-                    # each line ends with \n byte, so in order to exclude empty lines (\n only) we must check if line length is < 1
-                    if len(line) <= 1:
-                        if with_disconnects:
-                            yield None
-                        continue
-                        
-                    messages_count = messages_count + 1
-
-                    # local timestamps provided by the API always have 28 characters
-                    # eg 2019-08-01T08:52:00.0324272Z
-                    # let's split each line to date and message part and yield them as Response
-                    if decode_response:
-                        # if returning decoded response we need to convert:
-                        # timestamp returned by the API to Python datetime
-                        # message returned by the API to JSON object
-
-                        # since python datetime has microsecond precision and provided timestamp has 100ns precision
-                        # we ignore last two characters of timestmap provided by the API (last character is Z)
-                        # so we can decode it as python datetime
-                        timestamp = datetime.fromisoformat(line[0 : DATE_MESSAGE_SPLIT_INDEX - 2].decode("utf-8"))
-
-                        yield Response(timestamp, json.loads(line[DATE_MESSAGE_SPLIT_INDEX + 1 :]))
-                    else:
-                        yield Response(line[0:DATE_MESSAGE_SPLIT_INDEX], line[DATE_MESSAGE_SPLIT_INDEX + 1 :])
+            # decompress and split the whole slice in a worker thread so the CPU heavy
+            # decompression does not block the event loop that concurrently runs the data fetching tasks
+            lines = await asyncio.get_event_loop().run_in_executor(None, _read_slice_lines, current_slice_path)
+
+            for line in lines:
+                # empty lines (disconnect markers) have zero length after the newline split
+                if len(line) == 0:
+                    if with_disconnects:
+                        yield None
+                    continue
+
+                messages_count = messages_count + 1
+
+                # local timestamps provided by the API always have 28 characters
+                # eg 2019-08-01T08:52:00.0324272Z
+                # let's split each line to date and message part and yield them as Response
+                if decode_response:
+                    # if returning decoded response we need to convert:
+                    # timestamp returned by the API to Python datetime
+                    # message returned by the API to JSON object
+                    timestamp = _parse_line_timestamp(line)
+
+                    yield Response(timestamp, json.loads(line[DATE_MESSAGE_SPLIT_INDEX + 1 :]))
+                else:
+                    # memoryview slices skip the two bytes copies per message that
+                    # plain slicing would make - each view references just its own
+                    # line (split above already copied lines out of the decompressed
+                    # buffer), so retaining a view keeps only that line alive,
+                    # call bytes(view) to get an independent copy
+                    line_view = memoryview(line)
+
+                    yield Response(line_view[0:DATE_MESSAGE_SPLIT_INDEX], line_view[DATE_MESSAGE_SPLIT_INDEX + 1 :])
 
             self.logger.debug("processed slice: %s, messages count: %i", current_slice_path, messages_count)
 
             current_slice_date = current_slice_date + timedelta(seconds=60)
+            current_slice_offset = current_slice_offset + 1
 
         end_time = time()
 
@@ -161,14 +246,19 @@ class TardisClient:
     def clear_cache(self):
         shutil.rmtree(self.cache_dir)
 
+    async def close(self):
+        # closes cached HTTP sessions - call it when done replaying before shutting
+        # down the event loop, otherwise keep-alive connections stay open until exit
+        await close_sessions()
+
     def _validate_payload(self, exchange, from_date, to_date, filters):
-        if from_date is None or self._try_parse_as_iso_date(from_date) is False:
+        if from_date is None or not self._try_parse_as_iso_date(from_date):
             raise ValueError(
                 f"""Invalid 'from_date' argument: {from_date}. Please provide valid ISO date string.
                 https://docs.python.org/3/library/datetime.html#datetime.date.fromisoformat"""
             )
 
-        if to_date is None or self._try_parse_as_iso_date(to_date) is False:
+        if to_date is None or not self._try_parse_as_iso_date(to_date):
             raise ValueError(
                 f"""Invalid 'to_date' argument: {to_date}. Please provide valid ISO date string.
                 https://docs.python.org/3/library/datetime.html#datetime.date.fromisoformat"""
@@ -183,7 +273,7 @@ class TardisClient:
         if filters is None:
             return
 
-        if isinstance(filters, list) is False:
+        if not isinstance(filters, list):
             raise ValueError("Invalid 'filters' argument. Please provide valid filters Channel list")
 
         if len(filters) > 0:
@@ -192,11 +282,11 @@ class TardisClient:
                 if filter.symbols is None:
                     continue
 
-                if isinstance(filter.symbols, list) is False or any(
-                    isinstance(symbol, str) == False for symbol in filter.symbols
+                if not isinstance(filter.symbols, (list, tuple)) or any(
+                    not isinstance(symbol, str) for symbol in filter.symbols
                 ):
                     raise ValueError(
-                        f"Invalid 'symbols[]' argument: {filter.symbols}. Please provide list of symbol strings."
+                        f"Invalid 'symbols[]' argument: {filter.symbols}. Please provide list or tuple of symbol strings."
                     )
 
     def _try_parse_as_iso_date(self, date_string):